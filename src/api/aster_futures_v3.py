@@ -1,19 +1,91 @@
 from __future__ import annotations
 
-import math
-import os
+import asyncio
+import itertools
+import json
+import logging
+import re
 import time
-import uuid
 from dataclasses import dataclass
 from typing import Optional, Dict, Any
 
-import requests
-from eth_abi import encode
 from eth_account import Account
-from eth_account.messages import encode_defunct
 from web3 import Web3
 
-from .base import ExchangeClient, OrderResult, Side, PositionSide
+try:
+    # pycryptodome gelir web3'un eth-hash[pycryptodome] bagimliligiyla
+    from Crypto.Hash import keccak as _keccak
+except Exception:
+    _keccak = None  # type: ignore
+
+try:
+    import orjson
+except Exception:
+    orjson = None  # type: ignore
+
+from .base import ExchangeClient, OrderResult, Side, PositionSide, SymbolFilters, get_shared_session, make_client_order_id, parse_symbol_filters, scaled_floor
+
+_log = logging.getLogger(__name__)
+
+
+def _keccak256(data: bytes) -> bytes:
+    # Dogrudan Keccak-256; Web3.keccak sarmalayicisindan daha ucuz
+    if _keccak is not None:
+        h = _keccak.new(digest_bits=256)
+        h.update(data)
+        return h.digest()
+    return bytes(Web3.keccak(data))
+
+
+def _abi_encode_payload(json_str: str, user: bytes, signer: bytes, nonce: int) -> bytes:
+    # (string, address, address, uint256) icin elle ABI kodlama:
+    # 4 slotluk head (string offset'i 0x80, adresler sola sifir dolgulu,
+    # uint256 big-endian) + uzunluk onekli, 32'ye dolgulu string tail.
+    # eth_abi.encode ile ayni byte ciktisini uretir, dispatcher'siz.
+    s = json_str.encode()
+    return (
+        (0x80).to_bytes(32, 'big')
+        + user.rjust(32, b'\x00')
+        + signer.rjust(32, b'\x00')
+        + nonce.to_bytes(32, 'big')
+        + len(s).to_bytes(32, 'big')
+        + s
+        + b'\x00' * (-len(s) % 32)
+    )
+
+
+# JSON kacisi gerektirmeyen degerler icin guvenli karakter kumesi
+_PLAIN_RE = re.compile(r'^[0-9A-Za-z._\-]+$')
+
+
+def _normalize_value(v: Any) -> str:
+    if isinstance(v, (list, tuple)):
+        return str([str(i) if not isinstance(i, dict) else str(_normalize_mapping(i)) for i in v])
+    if isinstance(v, dict):
+        return str(_normalize_mapping(v))
+    return str(v)
+
+
+def _normalize_mapping(d: dict) -> Dict[str, str]:
+    return {k: _normalize_value(v) for k, v in d.items()}
+
+
+def _canonical_payload(d: dict) -> tuple[Dict[str, str], str]:
+    # Pratikte parametreler duz {str: skaler} oldugundan kanonik JSON'u tek
+    # gecis join ile uretir; json.dumps + replace turu yalnizca kacis
+    # gerektiren nadir degerler icin kalir. Cikti ikisi icin de bayt-aynidir.
+    norm = _normalize_mapping(d)
+    items = sorted(norm.items())
+    if all(_PLAIN_RE.match(k) and _PLAIN_RE.match(v) for k, v in items):
+        json_str = '{' + ','.join(f'"{k}":"{v}"' for k, v in items) + '}'
+    elif orjson is not None:
+        # orjson anahtarlari C tarafinda siralar ve zaten kompakt yazar;
+        # replace'ler ic ice deger repr'lari icin eski ciktiyla bire bir
+        # ayni kalsin diye korunur
+        json_str = orjson.dumps(norm, option=orjson.OPT_SORT_KEYS).decode().replace(" ", "").replace("'", '"')
+    else:
+        json_str = json.dumps(norm, sort_keys=True).replace(" ", "").replace("'", '"')
+    return norm, json_str
 
 
 @dataclass
@@ -29,148 +101,160 @@ class AsterFuturesV3Client(ExchangeClient):
         self.auth = auth
         self.recv_window = recv_window
         self.send_order_in_query = send_order_in_query
-        self.session = requests.Session()
-        self.session.headers.update({"Content-Type": "application/x-www-form-urlencoded", "User-Agent": "hedge-aster-bot/1.0"})
-        self._symbol_info_cache: Dict[str, Dict[str, Any]] = {}
+        # Istemci omru boyunca degismeyen imza alanlari bir kez stringlenir
+        self._recv_window_str = str(recv_window)
+        self._user = auth.user
+        self._signer = auth.signer
+        # ABI kodlama icin 20 baytlik ham adresler bir kez cozulur
+        self._user_bytes = bytes.fromhex(auth.user.removeprefix('0x'))
+        self._signer_bytes = bytes.fromhex(auth.signer.removeprefix('0x'))
+        # Ozel anahtar bir kez ayristirilir; imzalama dogrudan hash uzerinden
+        self._account = Account.from_key(auth.private_key)
+        self._sign_hash = getattr(self._account, 'unsafe_sign_hash', None) or self._account.signHash
+        # Form govdesinin Content-Type'ini aiohttp kendisi koyar
+        self._headers = {"User-Agent": "hedge-aster-bot/1.0"}
+        self._symbol_info_cache: Dict[str, SymbolFilters] = {}
+        self._filters_lock = asyncio.Lock()
+        # Baslangic epoch'u (us) + monoton sayac: benzersiz, kesin artan nonce
+        self._nonce_base = time.time_ns() // 1000
+        self._nonce_next = itertools.count(1).__next__
 
     def _nonce(self) -> int:
-        return math.trunc(time.time() * 1000000)
+        return self._nonce_base + self._nonce_next()
 
     def _timestamp_ms(self) -> int:
         return int(round(time.time() * 1000))
 
     def _sign(self, params: dict) -> dict:
         filtered = {k: v for k, v in params.items() if v is not None}
-        filtered["recvWindow"] = str(self.recv_window)
+        filtered["recvWindow"] = self._recv_window_str
         filtered["timestamp"] = str(self._timestamp_ms())
-        # normalize all values to string and stable json
-        def _normalize(d: dict) -> dict:
-            nd = {}
-            for k, v in d.items():
-                if isinstance(v, (list, tuple)):
-                    nd[k] = str([str(i) if not isinstance(i, dict) else str(_normalize(i)) for i in v])
-                elif isinstance(v, dict):
-                    nd[k] = str(_normalize(v))
-                else:
-                    nd[k] = str(v)
-            return nd
-        norm = _normalize(filtered)
-        import json
-        json_str = json.dumps(norm, sort_keys=True).replace(" ", "").replace("'", '"')
+        norm, json_str = _canonical_payload(filtered)
         nonce = self._nonce()
-        encoded = encode(['string', 'address', 'address', 'uint256'], [json_str, self.auth.user, self.auth.signer, nonce])
-        keccak_hex = Web3.keccak(encoded).hex()
-        signable_msg = encode_defunct(hexstr=keccak_hex)
-        signed = Account.sign_message(signable_message=signable_msg, private_key=self.auth.private_key)
+        encoded = _abi_encode_payload(json_str, self._user_bytes, self._signer_bytes, nonce)
+        digest = _keccak256(encoded)
+        # EIP-191 on eki elle eklenir; encode_defunct + sign_message ile
+        # birebir ayni imzayi uretir, anahtar tekrar ayristirilmadan
+        eth_hash = _keccak256(b'\x19Ethereum Signed Message:\n32' + digest)
+        signed = self._sign_hash(eth_hash)
         norm['nonce'] = str(nonce)
-        norm['user'] = self.auth.user
-        norm['signer'] = self.auth.signer
+        norm['user'] = self._user
+        norm['signer'] = self._signer
         norm['signature'] = '0x' + signed.signature.hex()
         return norm
 
-    def _request(self, method: str, path: str, params: dict) -> dict:
-        if path == '/fapi/v3/order':
-            print('[debug] unsigned params:', params)
+    async def _request(self, method: str, path: str, params: dict) -> dict:
+        # isEnabledFor korumasi: debug kapaliyken redaksiyon dict'i hic kurulmaz
+        debug = _log.isEnabledFor(logging.DEBUG)
+        if debug and path == '/fapi/v3/order':
+            _log.debug('unsigned params: %s', params)
         body = self._sign(params)
-        if path == '/fapi/v3/order':
-            print('[debug] signed body:', {k: (body[k] if k not in ('signature', 'privateKey') else '***') for k in body})
+        if debug and path == '/fapi/v3/order':
+            _log.debug('signed body: %s', {k: (body[k] if k not in ('signature', 'privateKey') else '***') for k in body})
         url = f"{self.base_url}{path}"
+        session = await get_shared_session()
         if method == 'POST':
             if self.send_order_in_query and path == '/fapi/v3/order':
-                resp = self.session.post(url, params=body)
+                req = session.post(url, params=body, headers=self._headers)
             else:
-                resp = self.session.post(url, data=body)
+                req = session.post(url, data=body, headers=self._headers)
         elif method == 'GET':
-            resp = self.session.get(url, params=body)
+            req = session.get(url, params=body, headers=self._headers)
         elif method == 'DELETE':
-            resp = self.session.delete(url, data=body)
+            req = session.delete(url, data=body, headers=self._headers)
         else:
             raise ValueError("unsupported method")
-        if resp.status_code >= 400:
-            print(f"HTTP {resp.status_code} error body: {resp.text}")
-            resp.raise_for_status()
-        return resp.json() if resp.text else {}
+        async with req as resp:
+            text = await resp.text()
+            if resp.status >= 400:
+                _log.error("HTTP %s error body: %s", resp.status, text)
+                resp.raise_for_status()
+            return json.loads(text) if text else {}
 
-    def set_margin_type(self, symbol: str, margin_type: str = 'CROSSED') -> None:
-        self._request('POST', '/fapi/v1/marginType', {'symbol': symbol, 'marginType': margin_type})
+    async def set_margin_type(self, symbol: str, margin_type: str = 'CROSSED') -> None:
+        await self._request('POST', '/fapi/v1/marginType', {'symbol': symbol, 'marginType': margin_type})
 
-    def set_leverage(self, symbol: str, leverage: int = 10) -> None:
-        self._request('POST', '/fapi/v1/leverage', {'symbol': symbol, 'leverage': leverage})
+    async def set_leverage(self, symbol: str, leverage: int = 10) -> None:
+        await self._request('POST', '/fapi/v1/leverage', {'symbol': symbol, 'leverage': leverage})
 
-    def _get_symbol_filters(self, symbol: str) -> Dict[str, Any]:
-        if symbol in self._symbol_info_cache:
-            return self._symbol_info_cache[symbol]
-        try:
-            data = self._request('GET', '/fapi/v1/exchangeInfo', {})
-        except Exception:
-            data = {}
-        filters_map = {}
-        if isinstance(data, dict) and 'symbols' in data:
-            for s in data['symbols']:
-                if s.get('symbol') == symbol:
-                    for f in s.get('filters', []):
-                        filters_map[f.get('filterType')] = f
-                    break
-        self._symbol_info_cache[symbol] = filters_map
-        return filters_map
-
-    def _round_qty(self, symbol: str, qty: float) -> float:
-        filters = self._get_symbol_filters(symbol)
-        mls = filters.get('MARKET_LOT_SIZE') or filters.get('LOT_SIZE') or {}
-        step = float(mls.get('stepSize', '0.00000001')) if mls else 0.00000001
-        min_qty = float(mls.get('minQty', '0')) if mls else 0.0
-        if step <= 0:
-            step = 0.00000001
-        rounded = math.floor(qty / step) * step
-        if rounded < min_qty:
-            rounded = min_qty
-        return float(f"{rounded:.18f}")
+    async def _get_symbol_filters(self, symbol: str) -> SymbolFilters:
+        cached = self._symbol_info_cache.get(symbol)
+        if cached is not None:
+            return cached
+        # Es zamanli cold-miss'lerde tek istek atilsin
+        async with self._filters_lock:
+            cached = self._symbol_info_cache.get(symbol)
+            if cached is not None:
+                return cached
+            try:
+                data = await self._request('GET', '/fapi/v1/exchangeInfo', {})
+            except Exception:
+                data = {}
+            if isinstance(data, dict) and 'symbols' in data:
+                # Tek gecis: tum semboller cache'e alinir, sonraki cold-miss'ler
+                # endpoint'e bir daha gitmez
+                for s in data['symbols']:
+                    sym = s.get('symbol')
+                    if sym:
+                        self._symbol_info_cache[sym] = parse_symbol_filters(
+                            {f.get('filterType'): f for f in s.get('filters', [])}
+                        )
+            return self._symbol_info_cache.setdefault(symbol, parse_symbol_filters({}))
+
+    async def _format_qty(self, symbol: str, qty: float) -> str:
+        # Yuvarlama + minQty tabani + formatlama tek yerde, ara float
+        # gidis-donusu olmadan: tamsayi dogrudan stringlenir
+        filt = await self._get_symbol_filters(symbol)
+        r_int = max(scaled_floor(qty, filt), filt.min_qty_int)
+        if filt.exponent == 0:
+            return str(r_int)
+        s = str(r_int).rjust(filt.exponent + 1, '0')
+        s = s[:-filt.exponent] + '.' + s[-filt.exponent:]
+        return s.rstrip('0').rstrip('.')
 
     async def create_market_order(self, symbol: str, side: Side, quote_amount_usd: float, position_side: PositionSide = "BOTH") -> OrderResult:
         try:
-            self.set_margin_type(symbol, 'CROSSED')
-            self.set_leverage(symbol, 10)
+            await self.set_margin_type(symbol, 'CROSSED')
+            await self.set_leverage(symbol, 10)
         except Exception as e:
-            print(f"Config warn: {e}")
+            _log.warning("config warn: %s", e)
         price = await self.get_price(symbol)
         qty = quote_amount_usd / price if price else 0
-        qty = self._round_qty(symbol, qty)
         params = {
             'symbol': symbol,
             'type': 'MARKET',
             'side': 'BUY' if side == 'buy' else 'SELL',
-            'quantity': f"{qty}",
+            'quantity': await self._format_qty(symbol, qty),
             'positionSide': 'BOTH',
-            'newClientOrderId': f"hast-{uuid.uuid4().hex[:12]}",
+            'newClientOrderId': make_client_order_id('hast-'),
         }
-        data = self._request('POST', '/fapi/v3/order', params)
+        data = await self._request('POST', '/fapi/v3/order', params)
         executed_qty = float(data.get('executedQty', data.get('cumQty', 0) or 0))
         avg_price = float(data.get('avgPrice', 0) or 0)
         return OrderResult(order_id=str(data.get('orderId', '')), symbol=symbol, side=side, executed_qty=executed_qty, avg_price=avg_price)
 
     async def close_position_market(self, symbol: str, side: Side, qty: float, position_side: PositionSide = "BOTH") -> Optional[OrderResult]:
-        qty = self._round_qty(symbol, qty)
         params = {
             'symbol': symbol,
             'type': 'MARKET',
             'side': 'SELL' if side == 'buy' else 'BUY',
             'reduceOnly': True,
-            'quantity': f"{qty}",
+            'quantity': await self._format_qty(symbol, qty),
             'positionSide': 'BOTH',
-            'newClientOrderId': f"hast-close-{uuid.uuid4().hex[:12]}",
+            'newClientOrderId': make_client_order_id('hast-close-'),
         }
-        data = self._request('POST', '/fapi/v3/order', params)
+        data = await self._request('POST', '/fapi/v3/order', params)
         executed_qty = float(data.get('executedQty', data.get('cumQty', 0) or 0))
         avg_price = float(data.get('avgPrice', 0) or 0)
         return OrderResult(order_id=str(data.get('orderId', '')), symbol=symbol, side='sell' if side=='buy' else 'buy', executed_qty=executed_qty, avg_price=avg_price)
 
     async def get_price(self, symbol: str) -> float:
-        data = self._request('GET', '/fapi/v1/ticker/price', {'symbol': symbol})
+        data = await self._request('GET', '/fapi/v1/ticker/price', {'symbol': symbol})
         return float(data.get('price', 0))
 
     async def get_position(self, symbol: str) -> Optional[dict]:
         try:
-            data = self._request('GET', '/fapi/v3/positionRisk', {'symbol': symbol})
+            data = await self._request('GET', '/fapi/v3/positionRisk', {'symbol': symbol})
             if isinstance(data, list) and data:
                 return data[0]
             return data
@@ -1,15 +1,25 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
-import hmac
-import math
+import json
+import logging
 import time
 import urllib.parse
 from typing import Dict, Any, Optional
 
-import requests
+from .base import ExchangeClient, OrderResult, Side, SymbolFilters, get_shared_session, make_client_order_id, parse_symbol_filters, scaled_floor
 
-from .base import ExchangeClient, OrderResult, Side
+_log = logging.getLogger(__name__)
+
+
+def _hmac_pads(key: bytes) -> tuple[bytes, bytes]:
+    # HMAC-SHA256 ipad/opad on hesaplama: stdlib hmac sarmalayicisini atlayip
+    # hashlib.sha256'yi (OpenSSL, SHA-NI destekli) dogrudan cagirmak icin
+    if len(key) > 64:
+        key = hashlib.sha256(key).digest()
+    key = key.ljust(64, b'\x00')
+    return bytes(b ^ 0x36 for b in key), bytes(b ^ 0x5c for b in key)
 
 
 class AsterV1HmacClient(ExchangeClient):
@@ -17,136 +27,125 @@ class AsterV1HmacClient(ExchangeClient):
         self.base = base_url.rstrip('/')
         self.api_key = api_key
         self.api_secret = api_secret.encode()
+        self._ipad, self._opad = _hmac_pads(self.api_secret)
         self.recv_window = recv_window_ms
-        self.session = requests.Session()
-        if self.api_key:
-            self.session.headers.update({'X-MBX-APIKEY': self.api_key, 'Content-Type': 'application/x-www-form-urlencoded'})
-        self._symbol_info_cache: Dict[str, Dict[str, Any]] = {}
+        # Form govdesinin Content-Type'ini aiohttp kendisi koyar
+        self._headers = {'X-MBX-APIKEY': self.api_key} if self.api_key else {}
+        self._symbol_info_cache: Dict[str, SymbolFilters] = {}
+        self._filters_lock = asyncio.Lock()
 
     def _ts(self) -> int:
         return int(time.time() * 1000)
 
-    def _sign_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    def _sign_params(self, params: Dict[str, Any], known_shape: bool = False) -> Dict[str, Any]:
         # Aster (Binance tarzı) HMAC: imza, gönderilen sorgu dizesinin birebir aynı
         # anahtar-değer sırası ile hesaplanmalı. Bu nedenle sıralama yapılmaz.
         params = {k: v for k, v in params.items() if v is not None}
         params.update({'timestamp': str(self._ts()), 'recvWindow': str(self.recv_window)})
-        query = urllib.parse.urlencode(params, doseq=True)
-        sig = hmac.new(self.api_secret, query.encode(), hashlib.sha256).hexdigest()
-        params['signature'] = sig
+        if known_shape:
+            # Sabit sekilli emir parametrelerinin tum degerleri URL-guvenli;
+            # urlencode'un anahtar basi kacis maliyeti atlanir, cikti ayni
+            query = '&'.join(f'{k}={v}' for k, v in params.items())
+        else:
+            query = urllib.parse.urlencode(params, doseq=True)
+        inner = hashlib.sha256(self._ipad)
+        inner.update(query.encode())
+        outer = hashlib.sha256(self._opad)
+        outer.update(inner.digest())
+        params['signature'] = outer.hexdigest()
         return params
 
-    def _post(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
-        signed = self._sign_params(params)
+    async def _post(self, path: str, params: Dict[str, Any], known_shape: bool = False) -> Dict[str, Any]:
+        signed = self._sign_params(params, known_shape=known_shape)
         url = self.base + path
-        r = self.session.post(url, data=signed, timeout=15)
-        if r.status_code >= 400:
-            print(f"[hmac v1] POST {url} -> HTTP {r.status_code}: {r.text}")
-        r.raise_for_status()
-        return r.json() if r.text else {}
-
-    def _get(self, path: str, params: Optional[Dict[str, Any]] = None, signed: bool = False) -> Dict[str, Any]:
+        session = await get_shared_session()
+        async with session.post(url, data=signed, headers=self._headers) as r:
+            text = await r.text()
+            if r.status >= 400:
+                _log.error("[hmac v1] POST %s -> HTTP %s: %s", url, r.status, text)
+            r.raise_for_status()
+            return json.loads(text) if text else {}
+
+    async def _get(self, path: str, params: Optional[Dict[str, Any]] = None, signed: bool = False) -> Dict[str, Any]:
         params = params or {}
         if signed:
             params = self._sign_params(params)
         url = self.base + path
-        r = self.session.get(url, params=params, timeout=15)
-        if r.status_code >= 400:
-            print(f"[hmac v1] GET {url} -> HTTP {r.status_code}: {r.text}")
-        r.raise_for_status()
-        return r.json()
-
-    def _get_symbol_filters(self, symbol: str) -> Dict[str, Any]:
-        if symbol in self._symbol_info_cache:
-            return self._symbol_info_cache[symbol]
-        try:
-            data = self._get('/fapi/v1/exchangeInfo', {})
-        except Exception:
-            data = {}
-        filters_map: Dict[str, Any] = {}
-        if isinstance(data, dict) and 'symbols' in data:
-            for s in data['symbols']:
-                if s.get('symbol') == symbol:
-                    for f in s.get('filters', []):
-                        filters_map[f.get('filterType')] = f
-                    break
-        self._symbol_info_cache[symbol] = filters_map
-        return filters_map
-
-    def _round_qty(self, symbol: str, qty: float) -> float:
-        try:
-            filters = self._get_symbol_filters(symbol)
-            mls = filters.get('MARKET_LOT_SIZE') or filters.get('LOT_SIZE') or {}
-            step_str = mls.get('stepSize', '0.00000001')
-            min_qty = float(mls.get('minQty', '0')) if mls else 0.0
-        except Exception:
-            step_str = '0.00000001'
-            min_qty = 0.0
-        from decimal import Decimal, ROUND_DOWN, getcontext
-        getcontext().prec = 28
-        step_dec = Decimal(step_str)
-        qty_dec = Decimal(str(qty))
-        if step_dec <= 0:
-            step_dec = Decimal('0.00000001')
-        rounded = qty_dec.quantize(step_dec, rounding=ROUND_DOWN)
-        if rounded < Decimal(str(min_qty)):
-            rounded = Decimal(str(min_qty))
-        return float(rounded)
-
-    def _format_qty(self, symbol: str, qty: float) -> str:
-        # Format with the exact number of decimals implied by stepSize, avoiding extra precision
-        try:
-            filters = self._get_symbol_filters(symbol)
-            mls = filters.get('MARKET_LOT_SIZE') or filters.get('LOT_SIZE') or {}
-            step_str = mls.get('stepSize', '0.00000001')
-        except Exception:
-            step_str = '0.00000001'
-        from decimal import Decimal, ROUND_DOWN, getcontext
-        getcontext().prec = 28
-        step_dec = Decimal(step_str)
-        qty_dec = Decimal(str(qty)).quantize(step_dec, rounding=ROUND_DOWN)
-        # Normalize to string without scientific notation
-        s = format(qty_dec, 'f')
-        if '.' in s:
-            s = s.rstrip('0').rstrip('.') if step_dec.as_tuple().exponent == 0 else s.rstrip('0').rstrip('.')
-        return s
+        session = await get_shared_session()
+        async with session.get(url, params=params, headers=self._headers) as r:
+            text = await r.text()
+            if r.status >= 400:
+                _log.error("[hmac v1] GET %s -> HTTP %s: %s", url, r.status, text)
+            r.raise_for_status()
+            return json.loads(text)
+
+    async def _get_symbol_filters(self, symbol: str) -> SymbolFilters:
+        cached = self._symbol_info_cache.get(symbol)
+        if cached is not None:
+            return cached
+        # Es zamanli cold-miss'lerde tek istek atilsin
+        async with self._filters_lock:
+            cached = self._symbol_info_cache.get(symbol)
+            if cached is not None:
+                return cached
+            try:
+                data = await self._get('/fapi/v1/exchangeInfo', {})
+            except Exception:
+                data = {}
+            if isinstance(data, dict) and 'symbols' in data:
+                # Tek gecis: tum semboller cache'e alinir, sonraki cold-miss'ler
+                # endpoint'e bir daha gitmez
+                for s in data['symbols']:
+                    sym = s.get('symbol')
+                    if sym:
+                        self._symbol_info_cache[sym] = parse_symbol_filters(
+                            {f.get('filterType'): f for f in s.get('filters', [])}
+                        )
+            return self._symbol_info_cache.setdefault(symbol, parse_symbol_filters({}))
+
+    async def _format_qty(self, symbol: str, qty: float) -> str:
+        # Format with the exact number of decimals implied by stepSize, avoiding extra precision;
+        # rounding + minQty floor happens here too, no intermediate float round-trip
+        filt = await self._get_symbol_filters(symbol)
+        r_int = max(scaled_floor(qty, filt), filt.min_qty_int)
+        if filt.exponent == 0:
+            return str(r_int)
+        s = str(r_int).rjust(filt.exponent + 1, '0')
+        s = s[:-filt.exponent] + '.' + s[-filt.exponent:]
+        return s.rstrip('0').rstrip('.')
 
     async def get_price(self, symbol: str) -> float:
-        data = self._get('/fapi/v1/ticker/price', {'symbol': symbol})
+        data = await self._get('/fapi/v1/ticker/price', {'symbol': symbol})
         return float(data.get('price', 0))
 
     async def create_market_order(self, symbol: str, side: Side, quote_amount_usd: float) -> OrderResult:
         # Futures için miktarı hesaplayıp quantity göndermek daha uyumlu
         price = await self.get_price(symbol)
         qty = max(quote_amount_usd / price, 0)
-        qty = self._round_qty(symbol, qty)
-        import uuid as _uuid
         params: Dict[str, Any] = {
             'symbol': symbol,
             'type': 'MARKET',
             'side': 'BUY' if side == 'buy' else 'SELL',
-            'quantity': self._format_qty(symbol, qty),
+            'quantity': await self._format_qty(symbol, qty),
             'positionSide': 'BOTH',
-            'newClientOrderId': f"hmac-{_uuid.uuid4().hex[:12]}",
+            'newClientOrderId': make_client_order_id('hmac-'),
         }
-        data = self._post('/fapi/v1/order', params)
+        data = await self._post('/fapi/v1/order', params, known_shape=True)
         executed_qty = float(data.get('executedQty', data.get('cumQty', 0) or 0))
         avg_price = float(data.get('avgPrice', 0) or 0)
         return OrderResult(order_id=str(data.get('orderId', '')), symbol=symbol, side=side, executed_qty=executed_qty, avg_price=avg_price)
 
     async def close_position_market(self, symbol: str, side: Side, qty: float) -> Optional[OrderResult]:
-        qty = self._round_qty(symbol, qty)
-        import uuid as _uuid
         params: Dict[str, Any] = {
             'symbol': symbol,
             'type': 'MARKET',
             'side': 'SELL' if side == 'buy' else 'BUY',
-            'quantity': self._format_qty(symbol, qty),
+            'quantity': await self._format_qty(symbol, qty),
             'positionSide': 'BOTH',
             'reduceOnly': 'true',
-            'newClientOrderId': f"hmac-close-{_uuid.uuid4().hex[:12]}",
+            'newClientOrderId': make_client_order_id('hmac-close-'),
         }
-        data = self._post('/fapi/v1/order', params)
+        data = await self._post('/fapi/v1/order', params, known_shape=True)
         executed_qty = float(data.get('executedQty', data.get('cumQty', 0) or 0))
         avg_price = float(data.get('avgPrice', 0) or 0)
         return OrderResult(order_id=str(data.get('orderId', '')), symbol=symbol, side='sell' if side=='buy' else 'buy', executed_qty=executed_qty, avg_price=avg_price)
@@ -157,15 +156,15 @@ class AsterV1HmacClient(ExchangeClient):
         last_err: Optional[Exception] = None
         for d in delays:
             try:
-                data = self._get('/fapi/v2/positionRisk', {'symbol': symbol}, signed=True)
+                data = await self._get('/fapi/v2/positionRisk', {'symbol': symbol}, signed=True)
                 if isinstance(data, list):
                     return data[0] if data else None
                 return data
             except Exception as e:
                 last_err = e
-                time.sleep(d)
+                await asyncio.sleep(d)
         try:
-            acc = self._get('/fapi/v1/account', {}, signed=True)
+            acc = await self._get('/fapi/v1/account', {}, signed=True)
             # Derive symbol exposure if available
             if isinstance(acc, dict) and 'positions' in acc:
                 for p in acc.get('positions', []):
@@ -174,5 +173,5 @@ class AsterV1HmacClient(ExchangeClient):
         except Exception:
             pass
         if last_err:
-            print(f"[position] fallback failed: {last_err}")
+            _log.error("[hmac v1] position fallback failed: %s", last_err)
         return None
@@ -1,13 +1,94 @@
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass
-from typing import Optional, Literal
+from decimal import Decimal, getcontext
+from typing import Optional, Literal, Dict, Any
 
+import aiohttp
+
+
+getcontext().prec = 28
 
 Side = Literal["buy", "sell"]
 PositionSide = Literal["LONG", "SHORT", "BOTH"]
 
 
+def make_client_order_id(prefix: str) -> str:
+    # uuid4 + hex dilimleme yerine 6 bayt rastgelelik; ayni 12 karakterlik
+    # sonek, cok daha az is
+    return prefix + os.urandom(6).hex()
+
+
+@dataclass(slots=True)
+class SymbolFilters:
+    """exchangeInfo'dan bir kez ayristirilip cache'lenen lot filtreleri."""
+    step: Decimal
+    min_qty: Decimal
+    exponent: int  # step'in ondalik basamak sayisi
+    step_int: int  # step * 10**exponent
+    min_qty_int: int  # min_qty * 10**exponent
+
+
+def _make_filters(step: Decimal, min_qty: Decimal) -> SymbolFilters:
+    exponent = max(-step.as_tuple().exponent, 0)
+    return SymbolFilters(
+        step=step,
+        min_qty=min_qty,
+        exponent=exponent,
+        step_int=int(step.scaleb(exponent)),
+        min_qty_int=int(min_qty.scaleb(exponent)),
+    )
+
+
+_DEFAULT_FILTERS = _make_filters(Decimal('0.00000001'), Decimal('0'))
+
+
+def scaled_floor(qty: float, filt: SymbolFilters) -> int:
+    # Decimal(str(qty)) float'in en kisa ondalik gosterimini oldugu gibi
+    # olcekler; float carpimi + sabit epsilon buyuk olceklerde bir step
+    # asagi kayabiliyordu
+    q_int = int(Decimal(str(qty)).scaleb(filt.exponent))
+    return (q_int // filt.step_int) * filt.step_int
+
+
+def parse_symbol_filters(filters_map: Dict[str, Any]) -> SymbolFilters:
+    mls = filters_map.get('MARKET_LOT_SIZE') or filters_map.get('LOT_SIZE') or {}
+    try:
+        step = Decimal(mls.get('stepSize', '0.00000001'))
+        min_qty = Decimal(mls.get('minQty', '0'))
+    except Exception:
+        return _DEFAULT_FILTERS
+    if step <= 0:
+        step = Decimal('0.00000001')
+    return _make_filters(step, min_qty)
+
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+async def get_shared_session() -> aiohttp.ClientSession:
+    """Tum istemcilerin paylastigi keep-alive havuzlu aiohttp oturumu.
+
+    Baglanti havuzu sayesinde ayni host'a giden istekler TLS el sikismasini
+    tekrarlamaz; es zamanli A/B gonderimleri de event loop'u bloklamaz.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=15),
+            connector=aiohttp.TCPConnector(limit=64, limit_per_host=32, keepalive_timeout=30),
+        )
+    return _session
+
+
+async def close_shared_session() -> None:
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
 @dataclass
 class OrderResult:
     order_id: str
@@ -7,7 +7,18 @@ from typing import Optional
 from .base import ExchangeClient, OrderResult, Side
 
 
+_BASE_PRICES = {
+    "BTCUSDT": 60000.0,
+    "ETHUSDT": 2500.0,
+    "SOLUSDT": 150.0,
+    "BNBUSDT": 550.0,
+    "XRPUSDT": 0.6,
+}
+
+
 class StubExchangeClient(ExchangeClient):
+    __slots__ = ("name",)
+
     def __init__(self, name: str):
         self.name = name
 
@@ -35,15 +46,7 @@ class StubExchangeClient(ExchangeClient):
         )
 
     async def get_price(self, symbol: str) -> float:
-        base_prices = {
-            "BTCUSDT": 60000.0,
-            "ETHUSDT": 2500.0,
-            "SOLUSDT": 150.0,
-            "BNBUSDT": 550.0,
-            "XRPUSDT": 0.6,
-        }
-        jitter = 1 + random.uniform(-0.002, 0.002)
-        return base_prices.get(symbol, 100.0) * jitter
+        return _BASE_PRICES.get(symbol, 100.0) * (1 + random.uniform(-0.002, 0.002))
 
     async def get_position(self, symbol: str) -> Optional[dict]:
         return None
@@ -6,6 +6,7 @@ import random
 import uuid
 from datetime import datetime, timedelta, UTC
 
+from src.api.base import close_shared_session
 from src.api.stub_client import StubExchangeClient
 from src.reporting import Reporter, TradeRecord
 from src.config import Settings
@@ -26,6 +27,36 @@ def _now_iso() -> str:
     return datetime.now(UTC).isoformat()
 
 
+async def _retry(fn, *args, attempts: int = 3, base: float = 0.5, **kwargs):
+    """Retry with exponential backoff + jitter, shared by both legs.
+
+    Jitter keeps the parallel A/B legs from re-sending in lockstep when the
+    exchange is throttling."""
+    for attempt in range(attempts):
+        try:
+            return await fn(*args, **kwargs)
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            await asyncio.sleep(base * (2 ** attempt) * (0.5 + random.random()))
+
+
+async def _close_leg(client, label: str, symbol: str, side: str, qty: float) -> None:
+    print(f"[close] {label} closing {symbol} side={side} qty={qty}")
+    await asyncio.sleep(0.2)
+    if qty <= 0:
+        return
+    await _retry(client.close_position_market, symbol, side, qty)
+    # Post-close verify and double-shot if needed
+    await asyncio.sleep(0.3)
+    pos = await client.get_position(symbol)
+    rem = float(pos.get('positionAmt', 0) or 0) if isinstance(pos, dict) else 0.0
+    rem = abs(rem)
+    if rem > 0:
+        print(f"[close] {label} residual {rem} detected, sending second reduceOnly close")
+        await _retry(client.close_position_market, symbol, side, rem)
+
+
 async def run_cycle(settings: Settings, reporter: Reporter, a_client, b_client) -> None:
     cycle_id = uuid.uuid4().hex[:8]
     symbol = random.choice(settings.symbols)
@@ -35,15 +66,48 @@ async def run_cycle(settings: Settings, reporter: Reporter, a_client, b_client)
     a_side = "buy" if first_is_long else "sell"
     b_side = "sell" if first_is_long else "buy"
 
-    # Open A with simple retry
-    for attempt in range(3):
-        try:
-            a_open = await a_client.create_market_order(symbol=symbol, side=a_side, quote_amount_usd=quote_usd)
-            break
-        except Exception as e:
-            if attempt == 2:
-                raise
-            await asyncio.sleep(0.5 * (attempt + 1))
+    # Open both legs concurrently: the shorter the gap between the two fills,
+    # the smaller the unhedged exposure window
+    a_open, b_open = await asyncio.gather(
+        _retry(a_client.create_market_order, symbol=symbol, side=a_side, quote_amount_usd=quote_usd),
+        _retry(b_client.create_market_order, symbol=symbol, side=b_side, quote_amount_usd=quote_usd),
+        return_exceptions=True,
+    )
+    if isinstance(a_open, BaseException) or isinstance(b_open, BaseException):
+        # One leg failed: record and close the surviving fill before
+        # propagating — an unrecorded one-sided position is the worst case
+        for label, client, side, res in (("A", a_client, a_side, a_open), ("B", b_client, b_side, b_open)):
+            if isinstance(res, BaseException):
+                continue
+            print(f"[open] {('B' if label == 'A' else 'A')} leg failed, unwinding {label} fill")
+            reporter.write_trade(
+                TradeRecord(
+                    timestamp=_now_iso(),
+                    cycle_id=cycle_id,
+                    symbol=symbol,
+                    account=label,
+                    side=side,
+                    action="open",
+                    quote_usd=quote_usd,
+                    executed_qty=res.executed_qty,
+                    avg_price=res.avg_price,
+                )
+            )
+            await _close_leg(client, label, symbol, side, abs(res.executed_qty))
+            reporter.write_trade(
+                TradeRecord(
+                    timestamp=_now_iso(),
+                    cycle_id=cycle_id,
+                    symbol=symbol,
+                    account=label,
+                    side=side,
+                    action="close",
+                    quote_usd=0.0,
+                    executed_qty=res.executed_qty,
+                    avg_price=0.0,
+                )
+            )
+        raise a_open if isinstance(a_open, BaseException) else b_open
     reporter.write_trade(
         TradeRecord(
             timestamp=_now_iso(),
@@ -57,16 +121,6 @@ async def run_cycle(settings: Settings, reporter: Reporter, a_client, b_client)
             avg_price=a_open.avg_price,
         )
     )
-
-    # Open B with simple retry
-    for attempt in range(3):
-        try:
-            b_open = await b_client.create_market_order(symbol=symbol, side=b_side, quote_amount_usd=quote_usd)
-            break
-        except Exception as e:
-            if attempt == 2:
-                raise
-            await asyncio.sleep(0.5 * (attempt + 1))
     reporter.write_trade(
         TradeRecord(
             timestamp=_now_iso(),
@@ -84,41 +138,24 @@ async def run_cycle(settings: Settings, reporter: Reporter, a_client, b_client)
     hold_minutes = random.randint(settings.hold_min_minutes, settings.hold_max_minutes)
     await asyncio.sleep(hold_minutes * 60)
 
-    # Refresh actual positions from exchange
-    a_pos = await a_client.get_position(symbol)
-    b_pos = await b_client.get_position(symbol)
-    a_qty = float(a_pos.get('positionAmt', a_open.executed_qty) or 0) if isinstance(a_pos, dict) else a_open.executed_qty
-    b_qty = float(b_pos.get('positionAmt', b_open.executed_qty) or 0) if isinstance(b_pos, dict) else b_open.executed_qty
+    # Our own fills are authoritative for the close qty; optionally re-verify
+    # against the exchange (2 extra signed requests per cycle)
+    a_qty = a_open.executed_qty
+    b_qty = b_open.executed_qty
+    if settings.verify_position_before_close:
+        a_pos, b_pos = await asyncio.gather(a_client.get_position(symbol), b_client.get_position(symbol))
+        if isinstance(a_pos, dict):
+            a_qty = float(a_pos.get('positionAmt', a_qty) or 0)
+        if isinstance(b_pos, dict):
+            b_qty = float(b_pos.get('positionAmt', b_qty) or 0)
     a_qty = abs(a_qty)
     b_qty = abs(b_qty)
 
-    # Close A
-    print(f"[close] A closing {symbol} side={a_side} qty={a_qty}")
-    await asyncio.sleep(0.2)
-    if a_qty > 0:
-        for attempt in range(3):
-            try:
-                await a_client.close_position_market(symbol, a_side, a_qty)
-                break
-            except Exception:
-                if attempt == 2:
-                    raise
-                await asyncio.sleep(0.5 * (attempt + 1))
-        # Post-close verify and double-shot if needed
-        await asyncio.sleep(0.3)
-        a_pos2 = await a_client.get_position(symbol)
-        rem_a = float(a_pos2.get('positionAmt', 0) or 0) if isinstance(a_pos2, dict) else 0.0
-        rem_a = abs(rem_a)
-        if rem_a > 0:
-            print(f"[close] A residual {rem_a} detected, sending second reduceOnly close")
-            for attempt in range(3):
-                try:
-                    await a_client.close_position_market(symbol, a_side, rem_a)
-                    break
-                except Exception:
-                    if attempt == 2:
-                        raise
-                    await asyncio.sleep(0.5 * (attempt + 1))
+    # Close both legs concurrently
+    await asyncio.gather(
+        _close_leg(a_client, "A", symbol, a_side, a_qty),
+        _close_leg(b_client, "B", symbol, b_side, b_qty),
+    )
     reporter.write_trade(
         TradeRecord(
             timestamp=_now_iso(),
@@ -132,34 +169,6 @@ async def run_cycle(settings: Settings, reporter: Reporter, a_client, b_client)
             avg_price=0.0,
         )
     )
-
-    # Close B
-    print(f"[close] B closing {symbol} side={b_side} qty={b_qty}")
-    await asyncio.sleep(0.2)
-    if b_qty > 0:
-        for attempt in range(3):
-            try:
-                await b_client.close_position_market(symbol, b_side, b_qty)
-                break
-            except Exception:
-                if attempt == 2:
-                    raise
-                await asyncio.sleep(0.5 * (attempt + 1))
-        # Post-close verify and double-shot if needed
-        await asyncio.sleep(0.3)
-        b_pos2 = await b_client.get_position(symbol)
-        rem_b = float(b_pos2.get('positionAmt', 0) or 0) if isinstance(b_pos2, dict) else 0.0
-        rem_b = abs(rem_b)
-        if rem_b > 0:
-            print(f"[close] B residual {rem_b} detected, sending second reduceOnly close")
-            for attempt in range(3):
-                try:
-                    await b_client.close_position_market(symbol, b_side, rem_b)
-                    break
-                except Exception:
-                    if attempt == 2:
-                        raise
-                    await asyncio.sleep(0.5 * (attempt + 1))
     reporter.write_trade(
         TradeRecord(
             timestamp=_now_iso(),
@@ -229,6 +238,14 @@ async def main() -> None:
     max_runtime: float | None = float(max_runtime_minutes_env) if max_runtime_minutes_env.strip() else None
     start_time = datetime.now(UTC)
 
+    try:
+        await _run_loop(settings, reporter, a_client, b_client, run_once, max_runtime, start_time)
+    finally:
+        reporter.close()
+        await close_shared_session()
+
+
+async def _run_loop(settings: Settings, reporter: Reporter, a_client, b_client, run_once: bool, max_runtime: float | None, start_time: datetime) -> None:
     while True:
         # If RUN_ONCE enabled, make this cycle instantaneous (no hold/cooldown) by overriding ranges
         if run_once:
@@ -1,18 +1,90 @@
 from __future__ import annotations
 
+import functools
 import os
+import pickle
 from dataclasses import dataclass
-from typing import List
-from dotenv import load_dotenv
-
-
-load_dotenv()
-
-
-def _get_list(env_key: str, default: List[str]) -> List[str]:
-    raw = os.getenv(env_key, "")
-    parts = [p.strip() for p in raw.split(",") if p.strip()]
-    return parts if parts else list(default)
+from typing import Tuple
+from dotenv import load_dotenv, dotenv_values
+
+try:
+    import msgspec
+except Exception:
+    msgspec = None  # type: ignore
+
+
+_dotenv_loaded = False
+
+_DOTENV_PATH = ".env"
+_DOTENV_CACHE = ".env.cache.pkl"
+
+
+def _ensure_dotenv() -> None:
+    # .env dosyasi surec basina en fazla bir kez ayristirilir; modulun
+    # tekrar import edilmesi (test runner, reloader) yeniden okutmaz
+    global _dotenv_loaded
+    if _dotenv_loaded:
+        return
+    _dotenv_loaded = True
+    try:
+        mtime = os.stat(_DOTENV_PATH).st_mtime
+    except OSError:
+        # .env yoksa dotenv'in kendi arama mantigina birakilir
+        load_dotenv(override=False)
+        return
+    # Sicak baslangic: mtime eslesirse ayristirma tamamen atlanir,
+    # tek stat + pickle.load kalir
+    try:
+        with open(_DOTENV_CACHE, "rb") as f:
+            cached = pickle.load(f)
+        if cached.get("mtime") == mtime:
+            for k, v in cached["vars"].items():
+                os.environ.setdefault(k, v)
+            return
+    except Exception:
+        pass
+    parsed = {k: v for k, v in dotenv_values(_DOTENV_PATH).items() if v is not None}
+    for k, v in parsed.items():
+        os.environ.setdefault(k, v)
+    try:
+        # Cache .env'deki sirlari tasir: yalnizca sahibi okuyabilsin (0600)
+        fd = os.open(_DOTENV_CACHE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({"mtime": mtime, "vars": parsed}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
+
+
+# Tipli env yardimcilari: (anahtar, varsayilan) basina bir kez ayristirir;
+# load() disindan cagrildiklarinda da donusum maliyeti tekrarlanmaz
+@functools.lru_cache(maxsize=None)
+def _env_int(key: str, default: str) -> int:
+    return int(os.environ.get(key, default))
+
+
+@functools.lru_cache(maxsize=None)
+def _env_float(key: str, default: str) -> float:
+    return float(os.environ.get(key, default))
+
+
+@functools.lru_cache(maxsize=None)
+def _env_list(key: str, default: Tuple[str, ...]) -> Tuple[str, ...]:
+    raw = os.environ.get(key, "")
+    parts = tuple(p.strip() for p in raw.split(",") if p.strip())
+    return parts if parts else default
+
+
+if msgspec is not None:
+    class _NumericEnv(msgspec.Struct, frozen=True):
+        """Sayisal env alanlari tek msgspec.convert cagrisiyla cevrilir."""
+        MIN_USD: float = 100.0
+        MAX_USD: float = 500.0
+        HOLD_MIN_MINUTES: int = 30
+        HOLD_MAX_MINUTES: int = 180
+        COOLDOWN_MIN_MINUTES: int = 1
+        COOLDOWN_MAX_MINUTES: int = 5
+
+    _NUMERIC_KEYS = tuple(_NumericEnv.__struct_fields__)
 
 
 @dataclass
@@ -39,7 +111,7 @@ class Settings:
     hmac_api_key_b: str
     hmac_api_secret_b: str
 
-    symbols: List[str]
+    symbols: Tuple[str, ...]
 
     min_usd: float
     max_usd: float
@@ -53,35 +125,57 @@ class Settings:
     tz: str
     report_dir: str
 
+    # Kapanis oncesi borsadan pozisyon dogrulamasi (2 imzali istek/dongu);
+    # varsayilan kapali, emir donusundeki executedQty esas alinir
+    verify_position_before_close: bool = False
+
     @staticmethod
+    @functools.lru_cache(maxsize=1)
     def load() -> "Settings":
-        symbols = _get_list("SYMBOLS", ["BTCUSDT", "ETHUSDT", "SOLUSDT", "BNBUSDT", "XRPUSDT"])
-        min_usd = float(os.getenv("MIN_USD", "100"))
-        max_usd = float(os.getenv("MAX_USD", "500"))
+        _ensure_dotenv()
+        # Tek snapshot: dict.get, getenv sarmalayicisindan daha ucuz ve
+        # lru_cache sayesinde dataclass süreç başına bir kez kurulur
+        env = os.environ
+        symbols = _env_list("SYMBOLS", ("BTCUSDT", "ETHUSDT", "SOLUSDT", "BNBUSDT", "XRPUSDT"))
+        if msgspec is not None:
+            # Tum sayisal alanlar tek C cagrisiyla cevrilip dogrulanir
+            num = msgspec.convert(
+                {k: env[k] for k in _NUMERIC_KEYS if k in env}, _NumericEnv, strict=False
+            )
+            min_usd, max_usd = num.MIN_USD, num.MAX_USD
+            hold_min, hold_max = num.HOLD_MIN_MINUTES, num.HOLD_MAX_MINUTES
+            cooldown_min, cooldown_max = num.COOLDOWN_MIN_MINUTES, num.COOLDOWN_MAX_MINUTES
+        else:
+            min_usd = _env_float("MIN_USD", "100")
+            max_usd = _env_float("MAX_USD", "500")
+            hold_min = _env_int("HOLD_MIN_MINUTES", "30")
+            hold_max = _env_int("HOLD_MAX_MINUTES", "180")
+            cooldown_min = _env_int("COOLDOWN_MIN_MINUTES", "1")
+            cooldown_max = _env_int("COOLDOWN_MAX_MINUTES", "5")
         if max_usd < min_usd:
             raise ValueError("MAX_USD, MIN_USD'den kucuk olamaz")
         # Backward compatibility: if only single set provided, use for both
-        a_user = os.getenv("ASTER_USER_A") or os.getenv("ASTER_USER", "")
-        a_signer = os.getenv("ASTER_SIGNER_A") or os.getenv("ASTER_SIGNER") or a_user
-        a_pk = os.getenv("ASTER_PRIVATE_KEY_A") or os.getenv("ASTER_PRIVATE_KEY", "")
-        b_user = os.getenv("ASTER_USER_B") or os.getenv("ASTER_USER", "")
-        b_signer = os.getenv("ASTER_SIGNER_B") or os.getenv("ASTER_SIGNER") or b_user
-        b_pk = os.getenv("ASTER_PRIVATE_KEY_B") or os.getenv("ASTER_PRIVATE_KEY", "")
+        a_user = env.get("ASTER_USER_A") or env.get("ASTER_USER", "")
+        a_signer = env.get("ASTER_SIGNER_A") or env.get("ASTER_SIGNER") or a_user
+        a_pk = env.get("ASTER_PRIVATE_KEY_A") or env.get("ASTER_PRIVATE_KEY", "")
+        b_user = env.get("ASTER_USER_B") or env.get("ASTER_USER", "")
+        b_signer = env.get("ASTER_SIGNER_B") or env.get("ASTER_SIGNER") or b_user
+        b_pk = env.get("ASTER_PRIVATE_KEY_B") or env.get("ASTER_PRIVATE_KEY", "")
 
         # HMAC keys - prefer per-account; fallback to single ASTER_API_KEY/SECRET
-        hmac_key_a = os.getenv("HMAC_API_KEY_A") or os.getenv("ASTER_API_KEY", "")
-        hmac_sec_a = os.getenv("HMAC_API_SECRET_A") or os.getenv("ASTER_API_SECRET", "")
-        hmac_key_b = os.getenv("HMAC_API_KEY_B") or os.getenv("ASTER_API_KEY", "")
-        hmac_sec_b = os.getenv("HMAC_API_SECRET_B") or os.getenv("ASTER_API_SECRET", "")
+        hmac_key_a = env.get("HMAC_API_KEY_A") or env.get("ASTER_API_KEY", "")
+        hmac_sec_a = env.get("HMAC_API_SECRET_A") or env.get("ASTER_API_SECRET", "")
+        hmac_key_b = env.get("HMAC_API_KEY_B") or env.get("ASTER_API_KEY", "")
+        hmac_sec_b = env.get("HMAC_API_SECRET_B") or env.get("ASTER_API_SECRET", "")
 
         # Base URLs - prefer FAPI_BASE_URL, fallback to ASTER_BASE_URL
-        fapi_base = os.getenv("FAPI_BASE_URL") or os.getenv("ASTER_BASE_URL") or "https://fapi.asterdex.com"
+        fapi_base = env.get("FAPI_BASE_URL") or env.get("ASTER_BASE_URL") or "https://fapi.asterdex.com"
         return Settings(
-            account_a_api_key=os.getenv("ACCOUNT_A_API_KEY", ""),
-            account_a_api_secret=os.getenv("ACCOUNT_A_API_SECRET", ""),
-            account_b_api_key=os.getenv("ACCOUNT_B_API_KEY", ""),
-            account_b_api_secret=os.getenv("ACCOUNT_B_API_SECRET", ""),
-            base_url=os.getenv("BASE_URL", "https://api.placeholder.com"),
+            account_a_api_key=env.get("ACCOUNT_A_API_KEY", ""),
+            account_a_api_secret=env.get("ACCOUNT_A_API_SECRET", ""),
+            account_b_api_key=env.get("ACCOUNT_B_API_KEY", ""),
+            account_b_api_secret=env.get("ACCOUNT_B_API_SECRET", ""),
+            base_url=env.get("BASE_URL", "https://api.placeholder.com"),
             fapi_base_url=fapi_base,
             aster_user_a=a_user,
             aster_signer_a=a_signer,
@@ -96,10 +190,19 @@ class Settings:
             symbols=symbols,
             min_usd=min_usd,
             max_usd=max_usd,
-            hold_min_minutes=int(os.getenv("HOLD_MIN_MINUTES", "30")),
-            hold_max_minutes=int(os.getenv("HOLD_MAX_MINUTES", "180")),
-            cooldown_min_minutes=int(os.getenv("COOLDOWN_MIN_MINUTES", "1")),
-            cooldown_max_minutes=int(os.getenv("COOLDOWN_MAX_MINUTES", "5")),
-            tz=os.getenv("TZ", "UTC"),
-            report_dir=os.getenv("REPORT_DIR", "reports"),
+            hold_min_minutes=hold_min,
+            hold_max_minutes=hold_max,
+            cooldown_min_minutes=cooldown_min,
+            cooldown_max_minutes=cooldown_max,
+            tz=env.get("TZ", "UTC"),
+            report_dir=env.get("REPORT_DIR", "reports"),
+            verify_position_before_close=env.get("VERIFY_POSITION_BEFORE_CLOSE", "0") not in ("", "0", "false", "False"),
         )
+
+    @classmethod
+    def reset_cache(cls) -> None:
+        """Testlerde ortam degistikten sonra cache'leri temizlemek icin."""
+        cls.load.cache_clear()
+        _env_int.cache_clear()
+        _env_float.cache_clear()
+        _env_list.cache_clear()
@@ -1,16 +1,23 @@
 from __future__ import annotations
 
-import csv
+import atexit
 import json
+import operator
 import os
-from dataclasses import asdict, dataclass
+import time
+from collections import Counter
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List
+from zoneinfo import ZoneInfo
 
-import pytz
+try:
+    import orjson
+except Exception:
+    orjson = None  # type: ignore
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TradeRecord:
     timestamp: str
     cycle_id: str
@@ -23,60 +30,232 @@ class TradeRecord:
     avg_price: float
 
 
+# Alanlar basit skaler oldugundan (sembol/side/action'da virgul ya da
+# tirnak yok) satirlar csv modulu olmadan dogrudan bayt olarak kurulur
+_HEADER = b"timestamp,cycle_id,symbol,account,side,action,quote_usd,executed_qty,avg_price\n"
+
+# Tek attrgetter cagrisi 9 ayri nitelik erisiminin yerini alir; cikan
+# demet dogrudan % sablonuna beslenir
+_ROW = operator.attrgetter(
+    "timestamp", "cycle_id", "symbol", "account", "side", "action",
+    "quote_usd", "executed_qty", "avg_price",
+)
+_ROW_FMT = "%s,%s,%s,%s,%s,%s,%.8f,%.8f,%.8f\n"
+
+_NDJSON_KEYS = (
+    "timestamp", "cycle_id", "symbol", "account", "side", "action",
+    "quote_usd", "executed_qty", "avg_price",
+)
+
+
+# Sablon csv kacisi uygulamadigindan string alanlarda virgul/yenisatir
+# olamaz. Kucuk, kapali sozlukteki alanlar (sembol/hesap/yon/aksiyon)
+# ilk goruste dogrulanip cache'lenir; timestamp ve cycle_id kayit basina
+# benzersiz oldugundan cache'e alinmaz, dogrudan kontrol edilir
+_safe_values: set = set()
+
+
+def _check_row_safety(r: TradeRecord) -> None:
+    for v in (r.timestamp, r.cycle_id):
+        if "," in v or "\n" in v:
+            raise ValueError(f"CSV alaninda yasak karakter: {v!r}")
+    for v in (r.symbol, r.account, r.side, r.action):
+        if v in _safe_values:
+            continue
+        if "," in v or "\n" in v:
+            raise ValueError(f"CSV alaninda yasak karakter: {v!r}")
+        _safe_values.add(v)
+
+
+def _format_row(r: TradeRecord) -> bytes:
+    return (_ROW_FMT % _ROW(r)).encode()
+
+
+def _format_ndjson_row(r: TradeRecord) -> bytes:
+    d = dict(zip(_NDJSON_KEYS, _ROW(r)))
+    if orjson is not None:
+        return orjson.dumps(d) + b"\n"
+    return json.dumps(d, separators=(",", ":")).encode() + b"\n"
+
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+
 class Reporter:
+    # Tampon en gec bu kadar saniyede bir diske yazilir
+    _FLUSH_INTERVAL = 5.0
+
     def __init__(self, report_dir: str, tz_name: str = "UTC"):
         self.report_dir = report_dir
-        self.tz = pytz.timezone(tz_name)
+        self.tz = ZoneInfo(tz_name)
         os.makedirs(self.report_dir, exist_ok=True)
+        # Kalici dosya tutamaci: her trade'de open/stat/close yerine tek
+        # toplu write; gun degisiminde tutamac yenilenir
+        self._fh = None
+        self._ndjson_fh = None
+        self._current_path = ""
+        # Hangi gunluk dosyalarin basligi var, tek listdir ile ogrenilir;
+        # sonrasinda yazma yolunda stat() kalmaz
+        self._header_written = set(os.listdir(self.report_dir))
+        # Kayitlar once bellekte biriktirilir; esik dolunca ya da sure
+        # gecince tek toplu write ile yazilir
+        self._buf: List[TradeRecord] = []
+        self._buf_max = int(os.getenv("REPORT_BUF_MAX", "64"))
+        self._buf_deadline = time.monotonic() + self._FLUSH_INTERVAL
+        # Beklenmedik cikista ne tamponda ne OS tamponunda kayit kalmasin
+        atexit.register(self.close)
+        # Gunluk dosya yolu memoize edilir; gun donumu tek tamsayi bolme +
+        # karsilastirma ile yakalanir, strftime yalniz donumde calisir
+        self._cached_path = ""
+        self._tz_offset = datetime.now(self.tz).utcoffset().total_seconds()
+        self._current_day_idx = -1
+        # Ozet icerigi degismediyse JSON yeniden yazilmaz
+        self._last_summary_hash: int | None = None
+        # Ozet icin calisan sayaclar: her kayitta O(1) artis, ozet uretimi
+        # CSV'yi bastan taramaz; yeniden baslatmada bir kez kurtarma taramasi
+        self._running_counts: Counter[str] = Counter()
+        self._running_total = 0
+        self._recover_counts()
 
     def _today_filename(self) -> str:
-        today = datetime.now(self.tz).strftime("%Y-%m-%d")
-        return os.path.join(self.report_dir, f"trades_{today}.csv")
+        day_idx = int((time.time() + self._tz_offset) // 86400)
+        if day_idx == self._current_day_idx:
+            return self._cached_path
+        dt = datetime.now(self.tz)
+        # DST gecisinde offset degisebilir; donumde tazelenir
+        self._tz_offset = dt.utcoffset().total_seconds()
+        if self._current_day_idx != -1:
+            # Gece yarisini tamponda gecen kayitlar sayaclara eski gun
+            # uzerinden islendi; once eski gunun dosyasina insin, sonra
+            # sayaclar ve ozet hash'i sifirlansin. Eski tutamac bir daha
+            # yazilmayacagindan kapatilir (OS tamponu da boylece iner)
+            self._write_buf()
+            self._close_handle()
+            self._running_counts.clear()
+            self._running_total = 0
+            self._last_summary_hash = None
+        self._current_day_idx = int((time.time() + self._tz_offset) // 86400)
+        self._cached_path = os.path.join(self.report_dir, f"trades_{dt.strftime('%Y-%m-%d')}.csv")
+        return self._cached_path
 
-    def write_trade(self, record: TradeRecord) -> None:
+    def _recover_counts(self) -> None:
+        # Crash/yeniden baslatma sonrasi gunun dosyasindan sayaclari kur;
+        # once NDJSON aynasi denenir (C tarafinda json.loads), yoksa CSV
         filename = self._today_filename()
-        write_header = not os.path.exists(filename)
-        with open(filename, mode="a", newline="") as f:
-            writer = csv.DictWriter(
-                f,
-                fieldnames=[
-                    "timestamp",
-                    "cycle_id",
-                    "symbol",
-                    "account",
-                    "side",
-                    "action",
-                    "quote_usd",
-                    "executed_qty",
-                    "avg_price",
-                ],
-            )
-            if write_header:
-                writer.writeheader()
-            writer.writerow(asdict(record))
+        try:
+            f = open(filename.replace(".csv", ".ndjson"), "rb", buffering=1 << 20)
+        except FileNotFoundError:
+            pass
+        else:
+            with f:
+                for line in f:
+                    # Crash ani yarim satir birakmis olabilir; bozuk
+                    # satir kurtarmayi dusurmesin, atlansin
+                    try:
+                        sym = _json_loads(line)["symbol"]
+                    except Exception:
+                        continue
+                    self._running_counts[sym] += 1
+                    self._running_total += 1
+            return
+        try:
+            f = open(filename, "r", buffering=1 << 20)
+        except FileNotFoundError:
+            return
+        with f:
+            next(f, None)  # baslik satiri
+            for line in f:
+                parts = line.split(",", 4)
+                if len(parts) < 5:
+                    continue  # yarim kalmis son satir
+                self._running_counts[parts[2]] += 1
+                self._running_total += 1
+
+    def _ensure_handle(self, filename: str):
+        if self._fh is not None and self._current_path == filename:
+            return self._fh
+        self._close_handle()
+        self._fh = open(filename, mode="ab", buffering=1 << 16)
+        # NDJSON aynasi: satir basina bir JSON nesnesi, kurtarma taramasi
+        # ve dis tuketiciler icin CSV'den cok daha ucuz ayristirilir
+        self._ndjson_fh = open(filename.replace(".csv", ".ndjson"), mode="ab", buffering=1 << 16)
+        self._current_path = filename
+        base = os.path.basename(filename)
+        if base not in self._header_written:
+            self._fh.write(_HEADER)
+            self._header_written.add(base)
+        return self._fh
+
+    def write_trade(self, record: TradeRecord) -> None:
+        _check_row_safety(record)
+        self._buf.append(record)
+        self._running_counts[record.symbol] += 1
+        self._running_total += 1
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if len(self._buf) >= self._buf_max or time.monotonic() >= self._buf_deadline:
+            self._flush()
+
+    def _flush(self) -> None:
+        self._buf_deadline = time.monotonic() + self._FLUSH_INTERVAL
+        if not self._buf:
+            return
+        # Gun donumu kontrolu: donumde tampon _today_filename icinde eski
+        # gunun dosyasina bosaltilir
+        self._today_filename()
+        self._write_buf()
+
+    def _write_buf(self) -> None:
+        # Tamponu o an gecerli sayilan gunluk dosyaya yazar; donum
+        # kontrolu yapmaz
+        if not self._buf:
+            return
+        fh = self._ensure_handle(self._cached_path)
+        # Tum parti tek bayt blobu, dosya basina tek write() cagrisi
+        fh.write(b"".join(_format_row(r) for r in self._buf))
+        self._ndjson_fh.write(b"".join(_format_ndjson_row(r) for r in self._buf))
+        self._buf.clear()
+
+    def _close_handle(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+        if self._ndjson_fh is not None:
+            self._ndjson_fh.close()
+        self._fh = None
+        self._ndjson_fh = None
+        self._current_path = ""
+
+    def close(self) -> None:
+        self._flush()
+        self._close_handle()
+
+    def __enter__(self) -> "Reporter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
     def write_daily_summary(self) -> str:
-        """Aggregate today's CSV into a small JSON summary next to it."""
+        """Calisan sayaclardan gunun JSON ozetini yazar; CSV okunmaz."""
         filename = self._today_filename()
+        # Tampondaki satirlar da diske insin ki dis okuyucular gorsun
+        self._flush()
+        if self._fh is not None and self._current_path == filename:
+            self._fh.flush()
+            self._ndjson_fh.flush()
         summary_path = filename.replace(".csv", "_summary.json")
-        if not os.path.exists(filename):
-            with open(summary_path, "w") as f:
-                json.dump({"trades": 0}, f, indent=2)
+        # Ayni gun icinde ayni toplamlarla tekrar cagrildiysa dosyaya
+        # dokunmadan don; inode guncellemesi ve write syscall'i atlanir
+        content_hash = hash((filename, self._running_total) + tuple(sorted(self._running_counts.items())))
+        if content_hash == self._last_summary_hash:
             return summary_path
-        # Aggregate
-        total_trades = 0
-        symbols: Dict[str, int] = {}
-        with open(filename, newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                total_trades += 1
-                sym = row.get("symbol", "")
-                symbols[sym] = symbols.get(sym, 0) + 1
         data = {
             "date": os.path.basename(filename)[7:17],
-            "trades": total_trades,
-            "by_symbol": symbols,
+            "trades": self._running_total,
+            "by_symbol": dict(self._running_counts),
         }
         with open(summary_path, "w") as f:
             json.dump(data, f, indent=2)
+        self._last_summary_hash = content_hash
         return summary_path